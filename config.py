@@ -1,9 +1,14 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     DATABASE_URL: str
     BACKEND_URL: str 
     FRONTEND_URL: str
+    LINKEDIN_CLIENT_ID: str
+    LINKEDIN_CLIENT_SECRET: str
+    RUN_CREATE_ALL: bool = False # Create missing tables on startup (dev / first deploy)
+    REDIS_URL: Optional[str] = None # Shares circuit breaker state across workers
 
     class Config:
         env_file = ".env"
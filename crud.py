@@ -1,5 +1,32 @@
-from sqlalchemy.orm import Session
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
 import models
 
-def get_posts(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Post).offset(skip).limit(limit).all()
\ No newline at end of file
+PREVIEW_LENGTH = 280
+
+async def get_posts(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models.Post).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_post_previews(
+    db: AsyncSession,
+    before_created_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
+    limit: int = 20,
+):
+    # Keyset pagination: seek past the last seen (created_at, id) instead of OFFSET
+    stmt = (
+        select(
+            models.Post.id,
+            models.Post.created_at,
+            func.left(models.Post.post_text, PREVIEW_LENGTH).label("post_text_preview"),
+        )
+        .order_by(models.Post.created_at.desc(), models.Post.id.desc())
+        .limit(limit)
+    )
+    if before_created_at is not None and before_id is not None:
+        stmt = stmt.where(tuple_(models.Post.created_at, models.Post.id) < (before_created_at, before_id))
+    result = await db.execute(stmt)
+    return result.all()
@@ -1,12 +1,28 @@
-from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from config import settings 
 
 
-# NEW LINE: Use the URL from the settings
-engine = create_engine(settings.DATABASE_URL) 
+# libpq-style query parameters that asyncpg.connect() does not accept
+_LIBPQ_ONLY_PARAMS = ("sslmode", "channel_binding", "gssencmode", "connect_timeout")
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Use the URL from the settings, swapping in the asyncpg driver. Hosted Postgres
+# URLs usually carry ?sslmode=..., which asyncpg takes as its 'ssl' argument instead.
+_url = make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg")
+_connect_args = {"ssl": _url.query["sslmode"]} if "sslmode" in _url.query else {}
+DATABASE_URL = _url.difference_update_query(_LIBPQ_ONLY_PARAMS)
 
-Base = declarative_base()
\ No newline at end of file
+engine = create_async_engine(
+    DATABASE_URL,
+    connect_args=_connect_args,
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
+    pool_pre_ping=True,  # Drop stale connections before handing them out
+    pool_recycle=3600,
+)
+
+SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+Base = declarative_base()
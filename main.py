@@ -1,12 +1,23 @@
 # --- Imports ---
-from fastapi import FastAPI, Depends, Security 
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, Security, HTTPException, Query
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List
+from typing import List, Optional
+from datetime import datetime, timedelta, timezone
 from pydantic import BaseModel
-import os
-from fastapi.responses import RedirectResponse
+import asyncio
+import hashlib
+import functools
+import contextlib
+from urllib.parse import urlencode
+from cachetools import LRUCache, TTLCache
+from fastapi.responses import ORJSONResponse, RedirectResponse, StreamingResponse
+from starlette.background import BackgroundTask
 import httpx
+from aiolimiter import AsyncLimiter
+from purgatory import AsyncCircuitBreakerFactory, AsyncRedisUnitOfWork
+from purgatory.domain.model import OpenedState
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 
@@ -25,14 +36,108 @@ from langchain_core.output_parsers import StrOutputParser
 
 
 # --- App and DB Setup ---
-# Create all database tables defined in models.py
-models.Base.metadata.create_all(bind=engine)
-
 # Initialize the FastAPI app
 app = FastAPI(
     title="Influence OS AI Intern Project",
     description="API for generating LinkedIn content using Google Gemini.",
+    default_response_class=ORJSONResponse, # Faster JSON encoding for post lists
+)
+
+# Shared HTTP client so LinkedIn calls reuse pooled keep-alive connections
+_http: httpx.AsyncClient | None = None
+
+# LinkedIn member IDs (the 'sub' claim) keyed by a hash of the access token.
+# The ID never changes for a token, so we skip the userinfo call on repeat shares.
+_urn_cache: TTLCache = TTLCache(maxsize=10_000, ttl=3600)
+
+def _token_key(access_token: str) -> str:
+    return hashlib.blake2b(access_token.encode(), digest_size=16).hexdigest()
+
+# Outbound rate limits per provider, so traffic spikes don't run up Gemini
+# costs or trip LinkedIn's own throttling. These are per worker process, so the
+# overall cap is max_rate times the number of uvicorn workers.
+_gemini_limiter = AsyncLimiter(max_rate=60, time_period=60)
+_linkedin_limiter = AsyncLimiter(max_rate=100, time_period=60)
+
+# Circuit breakers per provider: after 5 consecutive failures, calls fail fast
+# for 30 seconds. State lives in Redis when REDIS_URL is set so all workers share it.
+# Cancellations (e.g. a client closing a stream) are not provider failures.
+circuit_breaker = AsyncCircuitBreakerFactory(
+    default_threshold=5,
+    default_ttl=30,
+    exclude=[asyncio.CancelledError, GeneratorExit],
+    uow=AsyncRedisUnitOfWork(settings.REDIS_URL) if settings.REDIS_URL else None,
 )
+
+@contextlib.asynccontextmanager
+async def _guarded(limiter: AsyncLimiter, circuit: str):
+    """
+    Runs the block behind the named circuit breaker, then waits for rate limit
+    capacity. The breaker is checked first so an open circuit fails fast
+    instead of queueing for a rate limit slot.
+    """
+    async with await circuit_breaker.get_breaker(circuit):
+        async with limiter:
+            yield
+
+class _UpstreamFailure(Exception):
+    """Raised inside a breaker so a failed upstream response counts as a failure."""
+    def __init__(self, response: httpx.Response):
+        self.response = response
+
+async def _linkedin_request(method: str, url: str, **kwargs) -> httpx.Response:
+    """
+    Sends a request to LinkedIn on the shared client, rate limited and behind
+    the 'linkedin' circuit breaker. 5xx responses and transport errors count
+    as breaker failures; 5xx responses are still returned to the caller.
+    429s are passed through without counting, since LinkedIn throttles per
+    member and one user's limit shouldn't open the circuit for everyone.
+    """
+    try:
+        async with _guarded(_linkedin_limiter, "linkedin"):
+            response = await _http.request(method, url, **kwargs)
+            if response.status_code >= 500:
+                raise _UpstreamFailure(response)
+    except _UpstreamFailure as exc:
+        return exc.response
+    return response
+
+@app.on_event("startup")
+async def create_tables():
+    """Create all database tables defined in models.py, if enabled."""
+    if not settings.RUN_CREATE_ALL:
+        return
+    async with engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+
+@app.on_event("startup")
+async def init_circuit_breakers():
+    """Connects the circuit breaker state store (a no-op when kept in memory)."""
+    await circuit_breaker.initialize()
+
+@app.on_event("startup")
+async def open_http_client():
+    """Opens the shared HTTP client used for all LinkedIn API calls."""
+    global _http
+    _http = httpx.AsyncClient(
+        http2=True,  # Multiplex LinkedIn calls over one connection
+        timeout=httpx.Timeout(30.0, connect=10.0),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=300),
+    )
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Closes the shared HTTP client and its pooled connections."""
+    await _http.aclose()
+
+@app.exception_handler(OpenedState)
+async def circuit_open_handler(request, exc: OpenedState):
+    """Fails fast with 503 while an upstream provider's circuit is open."""
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": f"{exc.circuit_name} is temporarily unavailable, please retry later"},
+    )
+
 # NEW: Define the security scheme
 security = HTTPBearer()
 
@@ -52,31 +157,46 @@ app.add_middleware(
 )
 
 # Database session dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 
 # --- AI Setup ---
-# Initialize the Google Gemini model
-llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest")
-
-# Create the prompt template
-prompt = ChatPromptTemplate.from_template(
+# Static instructions go first so the shared prefix is identical on every call
+STATIC_COPYWRITER_PREAMBLE = (
     "You are an expert LinkedIn copywriter. Your goal is to create an engaging post."
-    "\n\n"
-    "Write a LinkedIn post for a person whose professional role is '{role}'."
-    " The post should be about the topic: '{topic}'."
-    " The tone of the post must be {tone}."
-    "\n\n"
-    "Please include 3-5 relevant hashtags in your response."
+    " Always include 3-5 relevant hashtags in your response."
 )
 
-# Create the processing chain using LangChain Expression Language (LCEL)
-chain = prompt | llm | StrOutputParser()
+@functools.lru_cache(maxsize=1)
+def get_chain():
+    """
+    Builds the LangChain pipeline on first use and reuses it afterwards,
+    so importing this module doesn't construct the Gemini client.
+    """
+    # Initialize the Google Gemini model
+    llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash-latest")
+
+    # Create the prompt template: static system block, then the per-request details
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", STATIC_COPYWRITER_PREAMBLE),
+        ("human",
+         "Write a LinkedIn post for a person whose professional role is '{role}'."
+         " The post should be about the topic: '{topic}'."
+         " The tone of the post must be {tone}."),
+    ])
+
+    # Create the processing chain using LangChain Expression Language (LCEL)
+    return prompt | llm | StrOutputParser()
+
+# IDs of already generated posts keyed by a hash of the normalized prompt inputs.
+# Repeated (role, topic, tone) requests are served from the database instead of Gemini.
+_post_cache: LRUCache = LRUCache(maxsize=1024)
+
+def _prompt_key(role: str, topic: str, tone: str) -> str:
+    raw = f"{role.strip().lower()}|{topic.strip().lower()}|{tone.strip().lower()}"
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
 
 
 # --- Pydantic Models for Requests ---
@@ -100,33 +220,73 @@ def read_root():
 
 # NEW ENDPOINT TO GET ALL POSTS
 @app.get("/posts", response_model=List[schemas.Post])
-def read_posts(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def read_posts(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_db)):
     """
     Retrieves a list of all posts from the database.
     """
-    posts = crud.get_posts(db, skip=skip, limit=limit)
+    posts = await crud.get_posts(db, skip=skip, limit=limit)
     return posts
+
+
+# Feed cursors are "<microseconds since epoch>_<post id>" of the last row returned
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+def _encode_cursor(created_at: datetime, post_id: int) -> str:
+    return f"{(created_at - _EPOCH) // timedelta(microseconds=1)}_{post_id}"
+
+def _decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        micros, post_id = cursor.split("_")
+        before_created_at, before_id = _EPOCH + timedelta(microseconds=int(micros)), int(post_id)
+    except (ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # posts.id is a 32-bit integer column
+    if not 1 <= before_id <= 2**31 - 1:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return before_created_at, before_id
+
+
+@app.get("/posts/feed", response_model=schemas.PostPage)
+async def read_post_feed(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Retrieves the newest posts first as short previews, one page at a time.
+    """
+    before_created_at, before_id = _decode_cursor(cursor) if cursor else (None, None)
+    rows = await crud.get_post_previews(
+        db, before_created_at=before_created_at, before_id=before_id, limit=limit
+    )
+    next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+    return {"items": rows, "next_cursor": next_cursor}
 # --- LINKEDIN AUTHENTICATION ENDPOINTS ---
 
+def _upstream_error(response: httpx.Response, message: str) -> HTTPException:
+    """
+    Builds an HTTPException that mirrors a failed LinkedIn response's status,
+    falling back to 502 if LinkedIn answered with an unexpected non-error code.
+    """
+    status_code = response.status_code if response.status_code >= 400 else 502
+    return HTTPException(status_code=status_code, detail={"error": message, "details": response.text})
+
+
+# LinkedIn authorization URL; everything in it is fixed, so build it once
+_LINKEDIN_AUTH_URL = "https://www.linkedin.com/oauth/v2/authorization?" + urlencode({
+    "response_type": "code",
+    "client_id": settings.LINKEDIN_CLIENT_ID,
+    "redirect_uri": f"{settings.BACKEND_URL}/auth/linkedin/callback",
+    # The required permissions (scopes) for your app
+    "scope": "profile openid email w_member_social",
+})
+
 @app.get("/auth/linkedin")
 async def login_via_linkedin():
     """
     Redirects the user to LinkedIn's authorization page.
     """
-    # The required permissions (scopes) for your app
-    scope = "profile openid email w_member_social"
-
-    # The URL the user will be sent to on LinkedIn
-    linkedin_auth_url = (
-        f"https://www.linkedin.com/oauth/v2/authorization"
-        f"?response_type=code"
-        f"&client_id={os.getenv('LINKEDIN_CLIENT_ID')}"
-        # f"&redirect_uri=http://127.0.0.1:8000/auth/linkedin/callback"
-        f"&redirect_uri={settings.BACKEND_URL}/auth/linkedin/callback" # MODIFIED LINE
-
-        f"&scope={scope}"
-    )
-    return RedirectResponse(url=linkedin_auth_url)
+    return RedirectResponse(url=_LINKEDIN_AUTH_URL)
 @app.get("/users/me")
 async def get_user_profile(credentials: HTTPAuthorizationCredentials = Security(security)):
     """
@@ -136,13 +296,36 @@ async def get_user_profile(credentials: HTTPAuthorizationCredentials = Security(
     profile_url = "https://api.linkedin.com/v2/userinfo"
     headers = {"Authorization": f"Bearer {access_token}"}
 
-    async with httpx.AsyncClient() as client:
-        response = await client.get(profile_url, headers=headers)
+    response = await _linkedin_request("GET", profile_url, headers=headers)
 
     if response.status_code == 200:
-        return response.json()
+        profile = response.json()
+        if "sub" in profile:
+            _urn_cache[_token_key(access_token)] = profile["sub"]
+        return profile
     else:
-        return {"error": "Failed to fetch profile", "details": response.text}
+        raise _upstream_error(response, "Failed to fetch profile")
+
+async def get_urn(access_token: str) -> str:
+    """
+    Returns the user's LinkedIn ID for an access token, using the cache
+    when possible and LinkedIn's userinfo endpoint otherwise.
+    Raises an HTTPException if the profile could not be fetched.
+    """
+    token_key = _token_key(access_token)
+    user_urn = _urn_cache.get(token_key)
+    if user_urn is None:
+        profile_url = "https://api.linkedin.com/v2/userinfo"
+        headers = {"Authorization": f"Bearer {access_token}"}
+        profile_response = await _linkedin_request("GET", profile_url, headers=headers)
+
+        if profile_response.status_code != 200:
+            raise _upstream_error(profile_response, "Could not fetch user profile to get author URN")
+
+        user_urn = profile_response.json()["sub"] # The user's ID is in the 'sub' field
+        _urn_cache[token_key] = user_urn
+    return user_urn
+
 
 # --- NEW ENDPOINT TO SHARE A POST ON LINKEDIN ---
 @app.post("/posts/share")
@@ -157,42 +340,31 @@ async def share_post_on_linkedin(
     """
     access_token = credentials.credentials
 
-    # 1. First, we need to get the user's unique LinkedIn ID (URN)
-    profile_url = "https://api.linkedin.com/v2/userinfo"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    
-    async with httpx.AsyncClient() as client:
-        profile_response = await client.get(profile_url, headers=headers)
-
-    if profile_response.status_code != 200:
-        return {"error": "Could not fetch user profile to get author URN"}
+    # 1. First, get the user's unique LinkedIn ID (URN). The share request
+    # depends on it, so there is no other I/O to overlap with this lookup.
+    user_urn = await get_urn(access_token)
 
-    user_urn = profile_response.json()["sub"] # The user's ID is in the 'sub' field
-
-    # 2. Now, construct the request body for the share API
+    # 2. Now, construct the request for the share API
     share_url = "https://api.linkedin.com/v2/posts"
-    share_payload = {
-        "author": f"urn:li:person:{user_urn}",
-        # LINE: Explicitly handle the newlines
-        "commentary": request.post_text.replace('\\n', '\n'), 
-        "visibility": "PUBLIC",
-        "distribution": {
-            "feedDistribution": "MAIN_FEED",
-            "targetEntities": [],
-            "thirdPartyDistributionChannels": []
-        },
-        "lifecycleState": "PUBLISHED",
-        "isReshareDisabledByAuthor": False
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Content-Type": "application/json",
     }
+    share_payload = schemas.LinkedInShare(
+        author=f"urn:li:person:{user_urn}",
+        # LINE: Explicitly handle the newlines
+        commentary=request.post_text.replace('\\n', '\n'),
+    )
 
     # 3. Make the POST request to share the content
-    async with httpx.AsyncClient() as client:
-        share_response = await client.post(share_url, headers=headers, json=share_payload)
+    share_response = await _linkedin_request(
+        "POST", share_url, headers=headers, content=share_payload.model_dump_json()
+    )
 
     if share_response.status_code == 201: # 201 Created means success
         return {"message": "Post shared successfully on LinkedIn!"}
     else:
-        return {"error": "Failed to share post", "details": share_response.json()}
+        raise _upstream_error(share_response, "Failed to share post")
 
 
 @app.get("/auth/linkedin/callback")
@@ -202,8 +374,8 @@ async def linkedin_callback(code: str):
     Exchanges the authorization code for an access token, then
     redirects the user back to the frontend with the token.
     """
-    client_id = os.getenv("LINKEDIN_CLIENT_ID")
-    client_secret = os.getenv("LINKEDIN_CLIENT_SECRET")
+    client_id = settings.LINKEDIN_CLIENT_ID
+    client_secret = settings.LINKEDIN_CLIENT_SECRET
     # redirect_uri = "http://127.0.0.1:8000/auth/linkedin/callback"
     redirect_uri = f"{settings.BACKEND_URL}/auth/linkedin/callback" # MODIFIED LINE
 
@@ -216,8 +388,12 @@ async def linkedin_callback(code: str):
         "client_secret": client_secret,
     }
 
-    async with httpx.AsyncClient() as client:
-        response = await client.post(token_url, data=payload)
+    try:
+        response = await _linkedin_request("POST", token_url, data=payload)
+    except (OpenedState, httpx.HTTPError):
+        # LinkedIn is unreachable or its circuit is open; this is a browser
+        # navigation, so send the user back to the frontend rather than a 503
+        return RedirectResponse(url=f"{settings.FRONTEND_URL}?error=auth_failed")
 
     if response.status_code == 200:
         token_data = response.json()
@@ -232,21 +408,97 @@ async def linkedin_callback(code: str):
 
 
 
-@app.post("/generate-post", response_model=schemas.Post)
-def generate_post(request: PostRequest, db: Session = Depends(get_db)):
+async def save_post(post_text: str, cache_key: str):
     """
-    Generates a LinkedIn post and saves it to the database.
+    Saves a generated post in its own short-lived session and returns the
+    stored row. INSERT ... RETURNING hands back the id and timestamp in the
+    same round trip, so no follow-up SELECT is needed.
     """
-    generated_text = chain.invoke({
-        "role": request.role,
-        "topic": request.topic,
-        "tone": request.tone
-    })
+    stmt = (
+        insert(models.Post)
+        .values(post_text=post_text)
+        .returning(models.Post.id, models.Post.created_at)
+    )
+    async with SessionLocal() as db:
+        row = (await db.execute(stmt)).one()
+        await db.commit()
+    _post_cache[cache_key] = row.id
 
-    # Create a new Post object and save it to the database
-    db_post = models.Post(post_text=generated_text)
-    db.add(db_post)
-    db.commit()
-    db.refresh(db_post)
+    return {"id": row.id, "post_text": post_text, "created_at": row.created_at}
 
-    return db_post
\ No newline at end of file
+
+@app.post("/generate-post", response_model=schemas.Post)
+async def generate_post(request: PostRequest):
+    """
+    Generates a LinkedIn post and saves it to the database.
+    A database connection is only taken once Gemini has finished.
+    """
+    cache_key = _prompt_key(request.role, request.topic, request.tone)
+    cached_id = _post_cache.get(cache_key)
+    if cached_id is not None:
+        async with SessionLocal() as db:
+            db_post = await db.get(models.Post, cached_id)
+        if db_post is not None:
+            return db_post
+
+    async with _guarded(_gemini_limiter, "gemini"):
+        generated_text = await get_chain().ainvoke({
+            "role": request.role,
+            "topic": request.topic,
+            "tone": request.tone
+        })
+
+    return await save_post(generated_text, cache_key)
+
+
+@app.post("/generate-post/stream")
+async def generate_post_stream(request: PostRequest):
+    """
+    Streams a generated LinkedIn post back as plain text while Gemini
+    produces it, then saves the full post to the database once sent.
+    """
+    cache_key = _prompt_key(request.role, request.topic, request.tone)
+    chunks: List[str] = []
+    completed = False
+
+    # Enter the limiter and breaker and wait for the first token before any
+    # headers go out, so an open circuit or a failing call still gets a proper
+    # error status. The guard is then handed over to the generator.
+    async with contextlib.AsyncExitStack() as stack:
+        await stack.enter_async_context(_guarded(_gemini_limiter, "gemini"))
+        token_iter = get_chain().astream({
+            "role": request.role,
+            "topic": request.topic,
+            "tone": request.tone
+        })
+        try:
+            first_chunk = await token_iter.__anext__()
+        except StopAsyncIteration:
+            first_chunk = None # Gemini produced no output at all
+        guard = stack.pop_all()
+
+    async def stream_tokens():
+        nonlocal completed
+        async with guard:
+            if first_chunk is not None:
+                chunks.append(first_chunk)
+                yield first_chunk
+            async for chunk in token_iter:
+                chunks.append(chunk)
+                yield chunk
+        completed = True
+
+    async def persist():
+        # Releases the guard if the stream never started; a no-op otherwise
+        await guard.aclose()
+        # Starlette still runs the background task after a client disconnect,
+        # so only save posts that were streamed to the end
+        post_text = "".join(chunks)
+        if completed and post_text:
+            await save_post(post_text, cache_key)
+
+    return StreamingResponse(
+        stream_tokens(),
+        media_type="text/plain",
+        background=BackgroundTask(persist),
+    )
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
+from typing import List, Optional
 
 class Post(BaseModel):
     id: int
@@ -7,4 +8,30 @@ class Post(BaseModel):
     created_at: datetime
 
     class Config:
-        from_attributes = True # This tells Pydantic to read the data from a database object
\ No newline at end of file
+        from_attributes = True # This tells Pydantic to read the data from a database object
+
+class PostPreview(BaseModel):
+    id: int
+    post_text_preview: str
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class PostPage(BaseModel):
+    items: List[PostPreview]
+    next_cursor: Optional[str] = None # Pass back as ?cursor= to fetch the next page
+
+# Request body for LinkedIn's /v2/posts share API
+class LinkedInDistribution(BaseModel):
+    feedDistribution: str = "MAIN_FEED"
+    targetEntities: List[str] = []
+    thirdPartyDistributionChannels: List[str] = []
+
+class LinkedInShare(BaseModel):
+    author: str
+    commentary: str
+    visibility: str = "PUBLIC"
+    distribution: LinkedInDistribution = Field(default_factory=LinkedInDistribution)
+    lifecycleState: str = "PUBLISHED"
+    isReshareDisabledByAuthor: bool = False